@@ -17,15 +17,23 @@ for the distiller agent.
 from __future__ import annotations
 
 import argparse
-import hashlib
+import errno
 import json
+import mmap
 import os
 import re
 import sys
 import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+try:
+    # Optional: orjson parses/serializes several times faster than stdlib json.
+    # The script stays runnable with a bare python3 when it is not installed.
+    import orjson
+except ImportError:
+    orjson = None
 
 
 DEFAULT_STATE_DIR = Path.home() / ".openclaw" / "state" / "jsonl-distill"
@@ -53,42 +61,157 @@ def _get_allowed_agent_ids() -> Optional[set[str]]:
 
 
 
+# Number of session files whose tails are opened and prefetched together in run_extract.
+READ_PREFETCH_WINDOW = 64
+
+
 NOISE_PREFIXES = (
     "✅ New session started",
     "NO_REPLY",
 )
 
+# Transcript/system boilerplate that should never become memories (matched case-insensitively).
+NOISE_SUBSTRINGS = (
+    "[queued messages while agent was busy]",
+    "you are running a boot check",
+    "boot.md — gateway startup health check",
+    "read heartbeat.md",
+    "claude_code_done",
+)
+
+_RE_RELEVANT_MEMORIES = re.compile(r"<relevant-memories>[\s\S]*?</relevant-memories>")
+_RE_CONVERSATION_INFO_HEADER = re.compile(r"^Conversation info \(untrusted metadata\):\s*\n+", re.IGNORECASE)
+_RE_REPLIED_MESSAGE_HEADER = re.compile(r"^Replied message \(untrusted, for context\):\s*\n+", re.IGNORECASE)
+_RE_JSON_FENCE = re.compile(r"```json[\s\S]*?```")
+_RE_MULTI_NEWLINE = re.compile(r"\n{3,}")
+
 
 def _now_ms() -> int:
     return int(time.time() * 1000)
 
 
-def _sha256(s: str) -> str:
-    return hashlib.sha256(s.encode("utf-8", errors="ignore")).hexdigest()
+# _extract_messages can reject non-chat records with a byte scan before parsing. That scan
+# only pays off with the stdlib parser: orjson parses a rejected tool-result record faster
+# than the scan (which misses, so it reads the whole line) can rule it out.
+if orjson is not None:
+    _PREFILTER_LINES = False
+
+    def _json_loads(data: Any) -> Any:
+        return orjson.loads(data)
+
+    def _json_dump_bytes(obj: Any, pretty: bool = False) -> bytes:
+        option = orjson.OPT_APPEND_NEWLINE
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
 
+else:
+    _PREFILTER_LINES = True
 
-def _read_jsonl_lines(path: Path, start_offset: int, max_bytes: int) -> Tuple[List[str], int]:
-    """Read up to max_bytes from path starting at start_offset. Returns (lines, end_offset)."""
-    lines: List[str] = []
-    with path.open("rb") as f:
-        f.seek(start_offset)
-        data = f.read(max_bytes)
-        end_offset = f.tell()
+    def _json_loads(data: Any) -> Any:
+        return json.loads(data)
+
+    def _json_dump_bytes(obj: Any, pretty: bool = False) -> bytes:
+        if pretty:
+            text = json.dumps(obj, ensure_ascii=False, indent=2)
+        else:
+            text = json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+        return (text + "\n").encode("utf-8")
+
+
+def _print_json(obj: Any) -> None:
+    """Write obj to stdout as one compact JSON line, bypassing the text layer."""
+    sys.stdout.buffer.write(_json_dump_bytes(obj))
+
+
+def _prefetch_tail(fd: int, start_offset: int, max_bytes: int) -> None:
+    """Hint the kernel to start readahead for a tail we are about to read (best effort)."""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        os.posix_fadvise(fd, start_offset, max_bytes, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+
+
+def _open_tail(path: str, direct_io: bool = False) -> Tuple[int, bool]:
+    """Open a session file for reading. Returns (fd, is_direct).
+
+    With direct_io, O_DIRECT is tried first so the tail bypasses the page cache; filesystems
+    that refuse it (e.g. tmpfs) and platforms without it get a normal buffered descriptor.
+    """
+    # O_BINARY (Windows only) keeps the read byte-exact: without it the CRT translates CRLF and
+    # stops at Ctrl-Z, so len(data) would no longer match the bytes consumed from the file.
+    flags = os.O_RDONLY | getattr(os, "O_BINARY", 0)
+    if direct_io and hasattr(os, "O_DIRECT"):
+        try:
+            return os.open(path, flags | os.O_DIRECT), True
+        except OSError:
+            pass
+    return os.open(path, flags), False
+
+
+def _pread_direct(fd: int, max_bytes: int, start_offset: int) -> bytes:
+    """pread for an O_DIRECT descriptor: offset, length and buffer must be block aligned.
+
+    The read starts at the page boundary below start_offset and is rounded up to whole pages,
+    into an anonymous mmap (always page aligned); the requested slice is copied out.
+    """
+    align = mmap.PAGESIZE
+    skip = start_offset % align
+    length = -(-(skip + max_bytes) // align) * align
+    buf = mmap.mmap(-1, length)
+    try:
+        try:
+            n = os.preadv(fd, [buf], start_offset - skip)
+        except OSError as e:
+            if e.errno != errno.EINVAL:
+                raise
+            # The filesystem accepted O_DIRECT at open but wants a different alignment:
+            # drop O_DIRECT on this descriptor and read normally. (fcntl is POSIX-only, hence the
+            # local import; O_DIRECT implies a POSIX platform.)
+            import fcntl
+
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) & ~os.O_DIRECT)
+            return os.pread(fd, max_bytes, start_offset)
+        return buf[skip : min(n, skip + max_bytes)] if n > skip else b""
+    finally:
+        buf.close()
+
+
+def _read_jsonl_lines(fd: int, start_offset: int, max_bytes: int, direct: bool = False) -> Tuple[List[bytes], int]:
+    """Read up to max_bytes from fd starting at start_offset. Returns (raw lines, end_offset).
+
+    Lines are returned as undecoded bytes; both orjson and stdlib json parse UTF-8 bytes directly.
+
+    The tail is read with pread rather than mmap: split() and the JSON parser need real bytes
+    objects, so a mapping would be copied anyway, and touching a mapped page after the session
+    file is truncated (rotation) raises SIGBUS instead of a catchable error.
+    """
+    lines: List[bytes] = []
+    if direct:
+        data = _pread_direct(fd, max_bytes, start_offset)
+    elif hasattr(os, "pread"):
+        # One positional read: no separate seek, and the descriptor's file position is never touched.
+        data = os.pread(fd, max_bytes, start_offset)
+    else:
+        os.lseek(fd, start_offset, os.SEEK_SET)
+        data = os.read(fd, max_bytes)
+    end_offset = start_offset + len(data)
 
     if not data:
         return [], end_offset
 
-    # Ensure we end on a newline boundary to avoid partial JSON lines.
-    if not data.endswith(b"\n"):
-        last_nl = data.rfind(b"\n")
-        if last_nl == -1:
-            # No complete line in this chunk.
-            return [], start_offset
-        data = data[: last_nl + 1]
-        end_offset = start_offset + len(data)
-
-    text = data.decode("utf-8", errors="replace")
-    for line in text.splitlines():
+    # Single C-level split over the buffer. The last piece is either b"" (data ended on a
+    # newline) or a partial JSON line that we leave for the next run.
+    pieces = data.split(b"\n")
+    partial = pieces.pop()
+    if not pieces:
+        # No complete line in this chunk.
+        return [], start_offset
+    end_offset -= len(partial)
+
+    for line in pieces:
         line = line.strip()
         if line:
             lines.append(line)
@@ -96,16 +219,16 @@ def _read_jsonl_lines(path: Path, start_offset: int, max_bytes: int) -> Tuple[Li
 
 
 def _extract_text_blocks(content: Any) -> str:
-    if content is None:
-        return ""
-    if isinstance(content, str):
+    # Content comes straight from the JSON parser, which only produces exact built-in types,
+    # so cheap `type() is` checks suffice. Plain string content is by far the common case.
+    if type(content) is str:
         return content
-    if isinstance(content, list):
+    if type(content) is list:
         parts: List[str] = []
         for block in content:
-            if isinstance(block, dict) and block.get("type") == "text":
+            if type(block) is dict and block.get("type") == "text":
                 t = block.get("text")
-                if isinstance(t, str) and t:
+                if type(t) is str and t:
                     parts.append(t)
         return "\n".join(parts)
     return ""
@@ -118,49 +241,147 @@ def _clean_text(s: str) -> str:
 
     # Drop injected memory blocks entirely.
     if "<relevant-memories>" in s:
-        s = re.sub(r"<relevant-memories>[\s\S]*?</relevant-memories>", "", s)
+        s = _RE_RELEVANT_MEMORIES.sub("", s)
 
     # Strip OpenClaw transcript headers that add noise but not meaning.
     # Keep the actual user content that follows.
-    s = re.sub(r"^Conversation info \(untrusted metadata\):\s*\n+", "", s, flags=re.IGNORECASE)
-    s = re.sub(r"^Replied message \(untrusted, for context\):\s*\n+", "", s, flags=re.IGNORECASE)
+    s = _RE_CONVERSATION_INFO_HEADER.sub("", s)
+    s = _RE_REPLIED_MESSAGE_HEADER.sub("", s)
 
     # Drop embedded JSON blocks (often metadata) to reduce token waste.
-    s = re.sub(r"```json[\s\S]*?```", "", s)
+    if "```json" in s:
+        s = _RE_JSON_FENCE.sub("", s)
 
     # Collapse whitespace.
-    s = re.sub(r"\n{3,}", "\n\n", s)
+    if "\n\n\n" in s:
+        s = _RE_MULTI_NEWLINE.sub("\n\n", s)
     return s.strip()
 
 
 def _is_noise(s: str) -> bool:
     if not s:
         return True
-    for p in NOISE_PREFIXES:
-        if s.startswith(p):
-            return True
-
-    lower = s.lower()
-
-    # Drop transcript/system boilerplate that should never become memories.
-    if "[queued messages while agent was busy]" in lower:
-        return True
-    if "you are running a boot check" in lower or "boot.md — gateway startup health check" in lower:
-        return True
-    if "read heartbeat.md" in lower:
-        return True
-    if "[claude_code_done]" in lower or "claude_code_done" in lower:
+    if s.startswith(NOISE_PREFIXES):
         return True
 
     # Skip overly long blocks (logs / dumps). The distiller can still capture the essence later.
+    # Checked first so we never lowercase a large dump just to drop it.
     if len(s) > 2000:
         return True
 
+    # One lowercase copy, then C-level substring searches; this beats a single combined
+    # IGNORECASE regex by more than an order of magnitude on typical message lengths.
+    lower = s.lower()
+    for p in NOISE_SUBSTRINGS:
+        if p in lower:
+            return True
+
     # Skip pure code fences (usually tool output).
-    if s.strip().startswith("```") and s.strip().endswith("```"):
-        return True
+    stripped = s.strip()
+    return stripped.startswith("```") and stripped.endswith("```")
+
+
+class ExtractedMessage(NamedTuple):
+    """A kept chat message. Tuples are cheaper than dicts while collecting; most get capped away."""
+
+    ts: Any
+    role: str
+    text: str
+
+
+def _extract_messages(lines: List[bytes]) -> List[ExtractedMessage]:
+    """Parse raw JSONL lines and keep cleaned, non-noise user/assistant messages.
+
+    Each line is parsed whole. The large records in a session tail (tool results, system
+    entries) are either dropped by the byte prefilter below or, with orjson, parsed faster
+    than a streaming parser could skip them, so streaming field extraction would only save
+    work on the chat messages we keep anyway.
+    """
+    extracted: List[ExtractedMessage] = []
+    prefilter = _PREFILTER_LINES
+    for line in lines:
+        if prefilter:
+            # Byte-level prefilter before parsing: a chat message record must contain the quoted
+            # "message" type and a quoted user/assistant role. Only values are matched (not
+            # `"key":"value"` pairs) so the check holds regardless of the writer's whitespace.
+            if b'"message"' not in line:
+                continue
+            if b'"user"' not in line and b'"assistant"' not in line:
+                continue
+        try:
+            obj = _json_loads(line)
+        except Exception:
+            # Most likely invalid UTF-8; retry with a lossy decode rather than dropping the line.
+            try:
+                obj = _json_loads(line.decode("utf-8", errors="replace"))
+            except Exception:
+                continue
+        if obj.get("type") != "message":
+            continue
+        msg = obj.get("message")
+        if not isinstance(msg, dict):
+            continue
+        role = msg.get("role")
+        if role not in ("user", "assistant"):
+            continue
+
+        text = _extract_text_blocks(msg.get("content"))
+        text = _clean_text(text)
+        if _is_noise(text):
+            continue
 
-    return False
+        extracted.append(ExtractedMessage(obj.get("timestamp") or msg.get("timestamp"), role, text))
+
+    return extracted
+
+
+def _extract_tail(
+    fd: int, start_offset: int, max_bytes: int, direct: bool = False
+) -> Tuple[List[ExtractedMessage], Optional[int]]:
+    """Read and filter one session tail. Returns (messages, end_offset).
+
+    end_offset is None when the chunk does not contain a complete line yet.
+    """
+    lines, end_offset = _read_jsonl_lines(fd, start_offset, max_bytes, direct)
+    if not lines:
+        return [], None
+    return _extract_messages(lines), end_offset
+
+
+def _extract_tail_from_path(
+    path: str, start_offset: int, max_bytes: int, direct_io: bool = False
+) -> Tuple[List[ExtractedMessage], Optional[int]]:
+    """ProcessPoolExecutor entry point: like _extract_tail, but opens the file itself."""
+    fd, direct = _open_tail(path, direct_io)
+    try:
+        return _extract_tail(fd, start_offset, max_bytes, direct)
+    finally:
+        os.close(fd)
+
+
+def _iter_tail_results(
+    tails: List[Tuple[str, str, int, int, int]], max_bytes: int, direct_io: bool = False
+) -> Iterator[Tuple[List[ExtractedMessage], Optional[int]]]:
+    """In-process counterpart of the worker pool; yields _extract_tail results in tail order."""
+    # Open a window of tails and hint readahead for all of them before reading any, so the
+    # kernel can overlap their I/O instead of servicing one file at a time. The window bounds
+    # how many descriptors are held open at once. Direct reads skip the hint: it would pull
+    # the tail into the page cache they are meant to bypass.
+    for i in range(0, len(tails), READ_PREFETCH_WINDOW):
+        window = tails[i : i + READ_PREFETCH_WINDOW]
+        fds: List[Tuple[int, bool]] = []
+        try:
+            for _, path, _, _, committed in window:
+                fd, direct = _open_tail(path, direct_io)
+                fds.append((fd, direct))
+                if not direct:
+                    _prefetch_tail(fd, committed, max_bytes)
+
+            for (_, _, _, _, committed), (fd, direct) in zip(window, fds):
+                yield _extract_tail(fd, committed, max_bytes, direct)
+        finally:
+            for fd, _ in fds:
+                os.close(fd)
 
 
 @dataclass
@@ -175,40 +396,72 @@ class CursorEntry:
 def _load_cursor(cursor_path: Path) -> Dict[str, Any]:
     if not cursor_path.exists():
         return {"version": 1, "files": {}, "createdAtMs": _now_ms(), "updatedAtMs": _now_ms()}
-    return json.loads(cursor_path.read_text("utf-8"))
+    return _json_loads(cursor_path.read_bytes())
+
+
+def _count_pending_batches(files: Dict[str, Any]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for v in files.values():
+        batch = v.get("pendingBatch")
+        if batch:
+            counts[batch] = counts.get(batch, 0) + 1
+    return counts
+
 
+def _pending_batches(cursor: Dict[str, Any]) -> Dict[str, int]:
+    """Return cursor["pendingBatches"] ({batch file: files still pending on it}).
 
-def _save_cursor(cursor_path: Path, cursor: Dict[str, Any]) -> None:
+    The index lets run_extract check for pending work without scanning every tracked file.
+    It is only a cache of the per-file pendingBatch fields: cursors written before it existed
+    get it rebuilt once, and commit_batch rebuilds it from its own full scan.
+    """
+    pending = cursor.get("pendingBatches")
+    if pending is None:
+        pending = _count_pending_batches(cursor.setdefault("files", {}))
+        cursor["pendingBatches"] = pending
+    return pending
+
+
+def _save_cursor(cursor_path: Path, cursor: Dict[str, Any], pretty: bool = False) -> None:
     cursor["updatedAtMs"] = _now_ms()
     cursor_path.parent.mkdir(parents=True, exist_ok=True)
     tmp = cursor_path.with_suffix(".tmp")
-    tmp.write_text(json.dumps(cursor, ensure_ascii=False, indent=2) + "\n", "utf-8")
+    tmp.write_bytes(_json_dump_bytes(cursor, pretty))
     tmp.replace(cursor_path)
 
 
-def _list_session_files(agents_dir: Path) -> List[Tuple[str, Path]]:
-    results: List[Tuple[str, Path]] = []
-    if not agents_dir.exists():
+def _list_session_files(agents_dir: Path) -> List[Tuple[str, str, os.stat_result]]:
+    """Return (agent_id, path, stat) for every live session file.
+
+    Uses os.scandir so type checks come from the directory entry (no extra stat per entry),
+    and the one stat we do need is returned to callers instead of being repeated. Paths are
+    the entries' own str paths, which double as cursor keys.
+    """
+    results: List[Tuple[str, str, os.stat_result]] = []
+    try:
+        with os.scandir(agents_dir) as it:
+            agent_entries = sorted(it, key=lambda e: e.name)
+    except (FileNotFoundError, NotADirectoryError):
         return results
 
     allowed_agent_ids = _get_allowed_agent_ids()
 
-    for agent_dir in sorted(agents_dir.iterdir()):
-        if not agent_dir.is_dir():
+    for agent_entry in agent_entries:
+        if not agent_entry.is_dir():
             continue
-        agent_id = agent_dir.name
+        agent_id = agent_entry.name
         if agent_id in EXCLUDED_AGENT_IDS:
             continue
         if allowed_agent_ids is not None and agent_id not in allowed_agent_ids:
             continue
-        sessions_dir = agent_dir / "sessions"
-        if not sessions_dir.exists():
+        try:
+            with os.scandir(os.path.join(agent_entry.path, "sessions")) as it:
+                session_entries = sorted(it, key=lambda e: e.name)
+        except (FileNotFoundError, NotADirectoryError):
             continue
 
-        for f in sorted(sessions_dir.iterdir()):
-            name = f.name
-            if not f.is_file():
-                continue
+        for entry in session_entries:
+            name = entry.name
             if not name.endswith(".jsonl"):
                 continue
             if ".reset." in name:
@@ -216,19 +469,19 @@ def _list_session_files(agents_dir: Path) -> List[Tuple[str, Path]]:
                 continue
             if name.endswith(".lock") or ".deleted." in name:
                 continue
-            results.append((agent_id, f))
+            if not entry.is_file():
+                continue
+            results.append((agent_id, entry.path, entry.stat()))
 
     return results
 
 
-def init_from_now(state_dir: Path, agents_dir: Path) -> Dict[str, Any]:
+def init_from_now(state_dir: Path, agents_dir: Path, pretty: bool = False) -> Dict[str, Any]:
     cursor_path = state_dir / "cursor.json"
     cursor = _load_cursor(cursor_path)
     files = cursor.setdefault("files", {})
 
-    for agent_id, f in _list_session_files(agents_dir):
-        st = f.stat()
-        key = str(f)
+    for agent_id, key, st in _list_session_files(agents_dir):
         files[key] = {
             "agentId": agent_id,
             "inode": int(st.st_ino),
@@ -239,7 +492,10 @@ def init_from_now(state_dir: Path, agents_dir: Path) -> Dict[str, Any]:
             "updatedAtMs": _now_ms(),
         }
 
-    _save_cursor(cursor_path, cursor)
+    # Re-initialized files drop their pending batch; files that no longer exist keep theirs.
+    cursor["pendingBatches"] = _count_pending_batches(files)
+
+    _save_cursor(cursor_path, cursor, pretty)
     return {
         "ok": True,
         "action": "init",
@@ -248,29 +504,42 @@ def init_from_now(state_dir: Path, agents_dir: Path) -> Dict[str, Any]:
     }
 
 
-def run_extract(state_dir: Path, agents_dir: Path, max_bytes_per_file: int, max_messages_per_agent: int) -> Dict[str, Any]:
+def run_extract(
+    state_dir: Path,
+    agents_dir: Path,
+    max_bytes_per_file: int,
+    max_messages_per_agent: int,
+    pretty: bool = False,
+    workers: int = 1,
+    direct_io: bool = False,
+    dedupe: bool = False,
+) -> Dict[str, Any]:
     cursor_path = state_dir / "cursor.json"
     cursor = _load_cursor(cursor_path)
     files: Dict[str, Any] = cursor.setdefault("files", {})
 
     # If there is a pending batch, return it and do not read new data.
-    pending_batches = sorted({v.get("pendingBatch") for v in files.values() if v.get("pendingBatch")})
-    pending_batches = [b for b in pending_batches if b]
+    pending_batches = _pending_batches(cursor)
+    if pending_batches:
+        # Trust only an empty index. A non-empty one may be stale (e.g. the batch was committed
+        # by an older version of this script), so confirm it against the per-file entries.
+        pending_batches = _count_pending_batches(files)
+        cursor["pendingBatches"] = pending_batches
     if pending_batches:
         return {
             "ok": True,
             "action": "pending",
-            "batchFiles": pending_batches,
+            "batchFiles": sorted(pending_batches),
             "cursorPath": str(cursor_path),
         }
 
     # Collect new messages.
-    per_agent_msgs: Dict[str, List[Dict[str, Any]]] = {}
+    per_agent_msgs: Dict[str, List[ExtractedMessage]] = {}
     touched_files: List[Dict[str, Any]] = []
+    # (agent_id, path, inode, size, committed) for every file with an unread tail.
+    tails: List[Tuple[str, str, int, int, int]] = []
 
-    for agent_id, f in _list_session_files(agents_dir):
-        key = str(f)
-        st = f.stat()
+    for agent_id, key, st in _list_session_files(agents_dir):
         inode = int(st.st_ino)
         size = int(st.st_size)
 
@@ -298,37 +567,30 @@ def run_extract(state_dir: Path, agents_dir: Path, max_bytes_per_file: int, max_
             }
             continue
 
-        lines, end_offset = _read_jsonl_lines(f, committed, max_bytes_per_file)
-        if not lines:
+        tails.append((agent_id, key, inode, size, committed))
+
+    if workers > 1 and len(tails) > 1:
+        # Tails are independent; parse them in worker processes. Results come back in tail
+        # order and all cursor bookkeeping stays in this process. Imported here because it pulls
+        # in multiprocessing and logging, a noticeable startup cost for the default serial path.
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(tails))) as pool:
+            results = list(pool.map(
+                _extract_tail_from_path,
+                [t[1] for t in tails],
+                [t[4] for t in tails],
+                [max_bytes_per_file] * len(tails),
+                [direct_io] * len(tails),
+            ))
+    else:
+        results = _iter_tail_results(tails, max_bytes_per_file, direct_io)
+
+    for (agent_id, key, inode, size, committed), (extracted, end_offset) in zip(tails, results):
+        if end_offset is None:
             # Might have hit partial line boundary; do not advance.
             continue
 
-        extracted: List[Dict[str, Any]] = []
-        for line in lines:
-            try:
-                obj = json.loads(line)
-            except Exception:
-                continue
-            if obj.get("type") != "message":
-                continue
-            msg = obj.get("message")
-            if not isinstance(msg, dict):
-                continue
-            role = msg.get("role")
-            if role not in ("user", "assistant"):
-                continue
-
-            text = _extract_text_blocks(msg.get("content"))
-            text = _clean_text(text)
-            if _is_noise(text):
-                continue
-
-            extracted.append({
-                "ts": obj.get("timestamp") or msg.get("timestamp"),
-                "role": role,
-                "text": text,
-            })
-
         if not extracted:
             # Advance committed to end_offset anyway to avoid re-reading pure noise.
             files[key] = {
@@ -357,8 +619,24 @@ def run_extract(state_dir: Path, agents_dir: Path, max_bytes_per_file: int, max_
         if len(msgs) > max_messages_per_agent:
             per_agent_msgs[agent_id] = msgs[-max_messages_per_agent:]
 
+    if dedupe:
+        # Drop repeated texts (e.g. "OK", status acknowledgements across sessions) that only cost
+        # the distiller tokens. This must run after the cap: deduping first could keep a copy the
+        # cap then cuts while dropping the one it would have kept, losing the text entirely.
+        seen_texts: set[str] = set()
+        for agent_id in sorted(per_agent_msgs.keys()):
+            unique: List[ExtractedMessage] = []
+            for m in per_agent_msgs[agent_id]:
+                if m.text not in seen_texts:
+                    seen_texts.add(m.text)
+                    unique.append(m)
+            if unique:
+                per_agent_msgs[agent_id] = unique
+            else:
+                del per_agent_msgs[agent_id]
+
     if not per_agent_msgs:
-        _save_cursor(cursor_path, cursor)
+        _save_cursor(cursor_path, cursor, pretty)
         return {
             "ok": True,
             "action": "noop",
@@ -376,16 +654,19 @@ def run_extract(state_dir: Path, agents_dir: Path, max_bytes_per_file: int, max_
         "agents": [
             {
                 "agentId": agent_id,
-                "messages": per_agent_msgs.get(agent_id, []),
+                "messages": [m._asdict() for m in per_agent_msgs.get(agent_id, [])],
             }
             for agent_id in sorted(per_agent_msgs.keys())
         ],
         "touchedFiles": touched_files,
     }
 
-    batch_path.write_text(json.dumps(batch_obj, ensure_ascii=False, indent=2) + "\n", "utf-8")
+    # Always indented: the distiller agent reads this file with line-oriented file tools, which
+    # may truncate a single multi-MB line. It is written once per batch, so this is not hot.
+    batch_path.write_bytes(_json_dump_bytes(batch_obj, pretty=True))
 
     # Write pending offsets.
+    pending_batches[str(batch_path)] = len(touched_files)
     for tf in touched_files:
         key = tf["path"]
         files[key] = {
@@ -398,7 +679,7 @@ def run_extract(state_dir: Path, agents_dir: Path, max_bytes_per_file: int, max_
             "updatedAtMs": _now_ms(),
         }
 
-    _save_cursor(cursor_path, cursor)
+    _save_cursor(cursor_path, cursor, pretty)
 
     return {
         "ok": True,
@@ -409,7 +690,7 @@ def run_extract(state_dir: Path, agents_dir: Path, max_bytes_per_file: int, max_
     }
 
 
-def commit_batch(state_dir: Path, batch_file: Path) -> Dict[str, Any]:
+def commit_batch(state_dir: Path, batch_file: Path, pretty: bool = False) -> Dict[str, Any]:
     cursor_path = state_dir / "cursor.json"
     cursor = _load_cursor(cursor_path)
     files: Dict[str, Any] = cursor.setdefault("files", {})
@@ -428,7 +709,11 @@ def commit_batch(state_dir: Path, batch_file: Path) -> Dict[str, Any]:
         files[key] = v
         committed_files += 1
 
-    _save_cursor(cursor_path, cursor)
+    # We scanned every entry anyway; rebuild the index rather than adjusting it, so a stale
+    # index can never keep a batch pending forever.
+    cursor["pendingBatches"] = _count_pending_batches(files)
+
+    _save_cursor(cursor_path, cursor, pretty)
     try:
         batch_file.unlink()
     except Exception:
@@ -445,18 +730,49 @@ def commit_batch(state_dir: Path, batch_file: Path) -> Dict[str, Any]:
 
 def main() -> int:
     ap = argparse.ArgumentParser()
+
+    # --pretty is accepted both before and after the subcommand. SUPPRESS keeps a subcommand
+    # that omits it from resetting a top-level --pretty back to False.
+    pretty_opt = argparse.ArgumentParser(add_help=False)
+    pretty_opt.add_argument(
+        "--pretty",
+        action="store_true",
+        default=argparse.SUPPRESS,
+        help="Indent cursor.json for human inspection (batch files are always indented)",
+    )
     ap.add_argument("--state-dir", default=str(DEFAULT_STATE_DIR))
     ap.add_argument("--agents-dir", default=str(DEFAULT_AGENTS_DIR))
+    ap.add_argument(
+        "--pretty",
+        action="store_true",
+        help="Indent cursor.json for human inspection (batch files are always indented)",
+    )
 
     sub = ap.add_subparsers(dest="cmd", required=True)
 
-    s_init = sub.add_parser("init", help="Initialize cursor to EOF for all current session files")
+    s_init = sub.add_parser("init", parents=[pretty_opt], help="Initialize cursor to EOF for all current session files")
 
-    s_run = sub.add_parser("run", help="Extract incremental message tail and create a batch file")
+    s_run = sub.add_parser("run", parents=[pretty_opt], help="Extract incremental message tail and create a batch file")
     s_run.add_argument("--max-bytes-per-file", type=int, default=256_000)
     s_run.add_argument("--max-messages-per-agent", type=int, default=30)
-
-    s_commit = sub.add_parser("commit", help="Commit a processed batch (advance committed offsets)")
+    s_run.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Parse session tails in N worker processes (default 1: in-process; 0: one per CPU)",
+    )
+    s_run.add_argument(
+        "--direct-io",
+        action="store_true",
+        help="Read session tails with O_DIRECT to bypass the page cache (Linux; worth it for large --max-bytes-per-file)",
+    )
+    s_run.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="Drop messages whose cleaned text already appears earlier in the same batch",
+    )
+
+    s_commit = sub.add_parser("commit", parents=[pretty_opt], help="Commit a processed batch (advance committed offsets)")
     s_commit.add_argument("--batch-file", required=True)
 
     args = ap.parse_args()
@@ -465,8 +781,8 @@ def main() -> int:
     agents_dir = Path(args.agents_dir).expanduser().resolve()
 
     if args.cmd == "init":
-        out = init_from_now(state_dir, agents_dir)
-        print(json.dumps(out, ensure_ascii=False))
+        out = init_from_now(state_dir, agents_dir, pretty=args.pretty)
+        _print_json(out)
         return 0
 
     if args.cmd == "run":
@@ -475,13 +791,17 @@ def main() -> int:
             agents_dir,
             max_bytes_per_file=int(args.max_bytes_per_file),
             max_messages_per_agent=int(args.max_messages_per_agent),
+            pretty=args.pretty,
+            workers=int(args.workers) or (os.cpu_count() or 1),
+            direct_io=bool(args.direct_io),
+            dedupe=bool(args.dedupe),
         )
-        print(json.dumps(out, ensure_ascii=False))
+        _print_json(out)
         return 0
 
     if args.cmd == "commit":
-        out = commit_batch(state_dir, Path(args.batch_file).expanduser().resolve())
-        print(json.dumps(out, ensure_ascii=False))
+        out = commit_batch(state_dir, Path(args.batch_file).expanduser().resolve(), pretty=args.pretty)
+        _print_json(out)
         return 0
 
     raise RuntimeError("unreachable")
@@ -0,0 +1,195 @@
+import { describe, it, beforeEach, afterEach } from "node:test";
+import assert from "node:assert/strict";
+import { spawnSync } from "node:child_process";
+import { appendFileSync, mkdirSync, mkdtempSync, readFileSync, rmSync, writeFileSync } from "node:fs";
+import { tmpdir } from "node:os";
+import path from "node:path";
+import { fileURLToPath } from "node:url";
+
+const SCRIPT = fileURLToPath(new URL("../scripts/jsonl_distill.py", import.meta.url));
+
+// ============================================================================
+// Test helpers
+// ============================================================================
+
+function messageLine(role, content) {
+  return JSON.stringify({ type: "message", timestamp: "t", message: { role, content } }) + "\n";
+}
+
+function runDistill(root, ...args) {
+  const res = spawnSync(
+    "python3",
+    [SCRIPT, "--state-dir", path.join(root, "state"), "--agents-dir", path.join(root, "agents"), ...args],
+    { encoding: "utf8" },
+  );
+  assert.equal(res.status, 0, res.stderr);
+  return JSON.parse(res.stdout);
+}
+
+function batchTexts(created) {
+  const batch = JSON.parse(readFileSync(created.batchFile, "utf8"));
+  return batch.agents.flatMap((a) => a.messages.map((m) => m.text));
+}
+
+function readCursor(cursorPath) {
+  return JSON.parse(readFileSync(cursorPath, "utf8"));
+}
+
+// ============================================================================
+// scripts/jsonl_distill.py
+// ============================================================================
+
+describe("jsonl_distill.py", () => {
+  let root;
+  let sessionFile;
+  let cursorPath;
+
+  beforeEach(() => {
+    root = mkdtempSync(path.join(tmpdir(), "jsonl-distill-test-"));
+    const sessionsDir = path.join(root, "agents", "main", "sessions");
+    mkdirSync(sessionsDir, { recursive: true });
+    sessionFile = path.join(sessionsDir, "s1.jsonl");
+    writeFileSync(sessionFile, "");
+    cursorPath = path.join(root, "state", "cursor.json");
+    runDistill(root, "init");
+  });
+
+  afterEach(() => {
+    rmSync(root, { recursive: true, force: true });
+  });
+
+  describe("tail parsing", () => {
+    it("keeps U+2028 and invalid UTF-8 messages and stops before a partial line", () => {
+      const complete = Buffer.concat([
+        // JSON.stringify leaves U+2028 unescaped; it must not be treated as a line break.
+        Buffer.from(messageLine("user", "first\u2028second")),
+        Buffer.from('{"type":"message","message":{"role":"user","content":"bad '),
+        Buffer.from([0xff, 0xfe]),
+        Buffer.from(' bytes"}}\n'),
+      ]);
+      appendFileSync(sessionFile, complete);
+      appendFileSync(sessionFile, '{"type":"message","message":{"role":"user","content":"partial');
+
+      const created = runDistill(root, "run");
+      assert.deepEqual(batchTexts(created), ["first\u2028second", "bad \ufffd\ufffd bytes"]);
+      assert.equal(readCursor(cursorPath).files[sessionFile].pending, complete.length);
+    });
+  });
+
+  describe("alternate read paths", () => {
+    let savedCursor;
+    let botFile;
+
+    // Two session files (two agents, so the worker pool gets more than one tail), each with
+    // an already-committed prefix so the new tail starts at an unaligned offset.
+    beforeEach(() => {
+      const botSessions = path.join(root, "agents", "bot", "sessions");
+      mkdirSync(botSessions, { recursive: true });
+      botFile = path.join(botSessions, "b1.jsonl");
+      writeFileSync(sessionFile, messageLine("user", "old main history"));
+      writeFileSync(botFile, messageLine("user", "old bot history ".repeat(300)));
+      runDistill(root, "init");
+      savedCursor = readFileSync(cursorPath);
+
+      let tail = "";
+      for (let i = 0; i < 20; i++) {
+        tail += messageLine("user", `question ${i} `.repeat(i + 1));
+        tail += messageLine("assistant", [{ type: "text", text: `answer ${i}` }, { type: "toolCall", id: `t${i}` }]);
+        tail += messageLine("toolResult", "tool output\n".repeat(50));
+      }
+      appendFileSync(sessionFile, tail);
+      appendFileSync(botFile, tail + '{"type":"message","message":{"role":"user","content":"partial');
+    });
+
+    // Run from the same starting cursor each time; returns batch texts and pending offsets.
+    function runFromSavedCursor(...args) {
+      writeFileSync(cursorPath, savedCursor);
+      const created = runDistill(root, "run", ...args);
+      assert.equal(created.action, "created");
+      const files = readCursor(cursorPath).files;
+      return {
+        texts: batchTexts(created),
+        pending: [files[sessionFile].pending, files[botFile].pending],
+      };
+    }
+
+    it("--workers matches the in-process batch and cursor", () => {
+      const expected = runFromSavedCursor();
+      assert.equal(expected.texts.length, 60);
+      assert.deepEqual(runFromSavedCursor("--workers", "2"), expected);
+    });
+
+    it("--direct-io matches the buffered batch and cursor", () => {
+      // On filesystems without O_DIRECT (e.g. tmpfs) this exercises the buffered fallback instead.
+      const expected = runFromSavedCursor();
+      assert.deepEqual(runFromSavedCursor("--direct-io"), expected);
+      assert.deepEqual(runFromSavedCursor("--direct-io", "--workers", "2"), expected);
+    });
+  });
+
+  describe("pendingBatches index", () => {
+    it("does not keep a batch pending once its file entries are committed", () => {
+      appendFileSync(sessionFile, messageLine("user", "remember this"));
+      const created = runDistill(root, "run");
+      assert.equal(created.action, "created");
+
+      // Simulate a commit done by a version that did not maintain the index:
+      // per-file entries are committed, but the index still lists the batch.
+      const cursor = JSON.parse(readFileSync(cursorPath, "utf8"));
+      for (const entry of Object.values(cursor.files)) {
+        if (entry.pendingBatch === created.batchFile) {
+          entry.committed = entry.pending;
+          entry.pending = null;
+          entry.pendingBatch = null;
+        }
+      }
+      cursor.pendingBatches = { [created.batchFile]: 4 };
+      writeFileSync(cursorPath, JSON.stringify(cursor));
+
+      assert.equal(runDistill(root, "run").action, "noop");
+
+      cursor.pendingBatches = { [created.batchFile]: 4 };
+      writeFileSync(cursorPath, JSON.stringify(cursor));
+      runDistill(root, "commit", "--batch-file", created.batchFile);
+      assert.deepEqual(JSON.parse(readFileSync(cursorPath, "utf8")).pendingBatches, {});
+    });
+
+    it("reports and then clears a real pending batch", () => {
+      appendFileSync(sessionFile, messageLine("user", "remember this"));
+      const created = runDistill(root, "run");
+
+      const pending = runDistill(root, "run");
+      assert.equal(pending.action, "pending");
+      assert.deepEqual(pending.batchFiles, [created.batchFile]);
+
+      const committed = runDistill(root, "commit", "--batch-file", created.batchFile);
+      assert.equal(committed.committedFiles, 1);
+      assert.equal(runDistill(root, "run").action, "noop");
+    });
+  });
+
+  describe("--dedupe", () => {
+    it("never drops a text that the per-agent cap would otherwise keep", () => {
+      // 37 messages, cap 30: message 1 repeats as message 37, so only the late copy
+      // survives the cap; messages 35 and 36 are a duplicate pair inside the cap window.
+      let lines = "";
+      for (let i = 1; i <= 37; i++) {
+        let text = `unique message ${i}`;
+        if (i === 1 || i === 37) text = "repeated fact";
+        if (i === 35 || i === 36) text = "echo";
+        lines += messageLine(i % 2 ? "user" : "assistant", text);
+      }
+      appendFileSync(sessionFile, lines);
+
+      const texts = batchTexts(runDistill(root, "run", "--dedupe", "--max-messages-per-agent", "30"));
+      assert.equal(texts.filter((t) => t === "repeated fact").length, 1);
+      assert.equal(texts.filter((t) => t === "echo").length, 1);
+      assert.equal(texts.length, 29);
+    });
+
+    it("keeps every message when dedupe is off", () => {
+      appendFileSync(sessionFile, messageLine("user", "OK") + messageLine("assistant", "OK"));
+      assert.deepEqual(batchTexts(runDistill(root, "run")), ["OK", "OK"]);
+    });
+  });
+});